@@ -1,5 +1,6 @@
 import inspect
 import sys
+from itertools import islice
 from common.paradox_lib import Game
 from pyradox.filetype.table import make_table, WikiDialect
 
@@ -17,8 +18,7 @@ class FileGenerator:
         self.parser = game.parser
 
         self.outpath = OUTPATH / game.short_game_name / game.version
-        if not self.outpath.exists():
-            self.outpath.mkdir(parents=True)
+        self.outpath.mkdir(parents=True, exist_ok=True)
 
     def run(self, command_line_args):
         """call all generators which were specified on the command line or all if none were specified"""
@@ -30,17 +30,21 @@ class FileGenerator:
                 else:
                     print('Method {} not found in {}'.format(method_name, self.__class__.__name__))
         else:
-            for method_name, method in inspect.getmembers(self):
+            # the methods are looked up on the class, because inspect.getmembers(self) would evaluate all properties
+            for method_name in dir(self):
                 if method_name.startswith('generate_'):
-                    if len(inspect.signature(method).parameters) == 0:  # skip functions which require a parameter
-                        self._write_text_file(method_name.removeprefix('generate_'), method())
+                    method = getattr(type(self), method_name, None)
+                    if not callable(method):
+                        continue
+                    if len(inspect.signature(method).parameters) == 1:  # skip functions which require a parameter
+                        self._write_text_file(method_name.removeprefix('generate_'), getattr(self, method_name)())
 
     def _write_text_file(self, name: str, content: str | list | dict):
         if isinstance(content, dict):
             for name_suffix, data in content.items():
                 self._really_write_file(f'{name}_{name_suffix}', data)
         elif isinstance(content, list):
-            self._really_write_file(name, '\n'.join(content))
+            self._really_write_lines(name, content)
         else:
             self._really_write_file(name, content)
 
@@ -49,8 +53,16 @@ class FileGenerator:
         with output_file.open('w') as f:
             f.write(content)
 
+    def _really_write_lines(self, name: str, lines: list[str]):
+        """write the lines separated by linebreaks without joining them into one big string first"""
+        output_file = self.outpath / '{}{}.txt'.format(self.game.short_game_name, name)
+        with output_file.open('w', buffering=1 << 16) as f:
+            if lines:
+                f.write(lines[0])
+                f.writelines('\n' + line for line in islice(lines, 1, None))
+
     def _write_lines_to_text_file(self, name: str, lines: list[str]):
-        self._write_text_file(name, '\n'.join(lines))
+        self._really_write_lines(name, lines)
 
     def make_wiki_table(self, data, column_specs=None, table_style='', sortable=True, one_line_per_cell=False,
                         merge_identical_cells_in_column=False, remove_empty_columns=False, row_id_key=None, **kwargs):
@@ -71,15 +83,10 @@ class FileGenerator:
             dialect.row_delimiter = '\n'
 
         if remove_empty_columns:
-            for key in list(data[0].keys()):
-                is_empty = True
-                for row in data:
-                    if row[key].strip() != '':
-                        is_empty = False
-                        break
-                if is_empty:
-                    for row in data:
-                        del row[key]
+            empty_columns = [key for key in data[0].keys() if not any(row[key].strip() for row in data)]
+            for row in data:
+                for key in empty_columns:
+                    del row[key]
 
         if column_specs is None:
             column_specs = self.get_column_specs(data, row_id_key)
@@ -89,15 +96,21 @@ class FileGenerator:
 
         if merge_identical_cells_in_column:
             row_count = len(data)
-            for i in range(row_count - 1):
-                for key, column_spec in column_specs:
-                    if key in data[i]:
-                        same_rows = 0
-                        while i+same_rows+1<row_count and data[i][key] == data[i+same_rows+1][key]:
-                            del data[i+same_rows+1][key]
-                            same_rows += 1
-                        if same_rows > 0:
-                            data[i][key] = f'rowspan="{same_rows+1}" | {data[i][key]}'
+            for key, column_spec in column_specs:
+                # single forward scan per column. Rows which were merged into a previous row are skipped
+                i = 0
+                while i < row_count - 1:
+                    if key not in data[i]:
+                        i += 1
+                        continue
+                    value = data[i][key]
+                    j = i
+                    while j + 1 < row_count and data[j + 1][key] == value:
+                        j += 1
+                        del data[j][key]
+                    if j > i:
+                        data[i][key] = f'rowspan="{j - i + 1}" | {value}'
+                    i = j + 1
 
         return make_table(data, dialect, column_specs=column_specs, table_style=table_style, sortable=sortable, **kwargs)
 
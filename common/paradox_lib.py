@@ -1,8 +1,8 @@
+import colorsys
 import json
 from typing import Any
 
-from colormath.color_conversions import convert_color
-from colormath.color_objects import sRGBColor, HSVColor
+from colormath.color_objects import sRGBColor
 from functools import cached_property
 from pathlib import Path
 
@@ -22,17 +22,17 @@ class Game:
     launcher_settings: Path
     parser: Any
 
+    @cached_property
+    def _launcher_json(self):
+        return json.loads(self.launcher_settings.read_bytes())
+
     @cached_property
     def version(self):
-        json_object = json.load(open(self.launcher_settings))
-        self.full_version = json_object['version']
-        return json_object['rawVersion']
+        return self._launcher_json['rawVersion']
 
     @cached_property
     def full_version(self):
-        json_object = json.load(open(self.launcher_settings))
-        self.version = json_object['rawVersion']
-        return json_object['version']
+        return self._launcher_json['version']
 
     @cached_property
     def major_version(self):
@@ -56,11 +56,13 @@ class PdxColor(sRGBColor):
         if isinstance(color_obj, list):
             return cls(color_obj[0], color_obj[1], color_obj[2], is_upscaled=True)
         elif isinstance(color_obj, Tree) and 'hsv' in color_obj:
-            rgb_color = convert_color(HSVColor(color_obj['hsv'][0], color_obj['hsv'][1], color_obj['hsv'][2]), sRGBColor)
-            return cls(rgb_color.rgb_r * 255.0, rgb_color.rgb_g * 255.0, rgb_color.rgb_b * 255.0)
+            h, s, v = color_obj['hsv']
+            r, g, b = colorsys.hsv_to_rgb(h, s, v)
+            return cls(r * 255.0, g * 255.0, b * 255.0)
         elif isinstance(color_obj, Tree) and 'hsv360' in color_obj:
-            rgb_color = convert_color(HSVColor(color_obj['hsv360'][0] / 360.0, color_obj['hsv360'][1] / 100.0, color_obj['hsv360'][2] / 100.0), sRGBColor)
-            return cls(rgb_color.rgb_r * 255.0, rgb_color.rgb_g * 255.0, rgb_color.rgb_b * 255.0)
+            h, s, v = color_obj['hsv360']
+            r, g, b = colorsys.hsv_to_rgb(h / 360.0, s / 100.0, v / 100.0)
+            return cls(r * 255.0, g * 255.0, b * 255.0)
         else:
             raise Exception('Unexpected color type: {}'.format(color_obj))
 
@@ -95,9 +97,15 @@ class PdxColor(sRGBColor):
 
 
 class NameableEntity:
+    # the frequently used attributes are in slots. __dict__ is still needed for the attributes which are set via
+    # kwargs and for cached_property
+    __slots__ = ('name', 'display_name', '_hash', '__dict__')
+
     def __init__(self, name: str, display_name: str, **kwargs):
         self.name = name
         self.display_name = display_name
+        # entities are used a lot in sets and as dict keys, so the hash of the name is only calculated once
+        self._hash = hash(name)
 
         for key, value in kwargs.items():
             setattr(self, key, value)
@@ -106,9 +114,11 @@ class NameableEntity:
         return self.display_name
 
     def __hash__(self):
-        return hash(self.name)
+        return self._hash
 
     def __eq__(self, other):
+        if other is self:
+            return True
         if other is None:
             return False
         if isinstance(other, str):
@@ -1,6 +1,6 @@
 """ParadoxParser is a class to parse paradox development studio game scripts into python objects.
 
-Key value pairs get converted into the Tree class which is a thin wrapper around a dict with helper functions.
+Key value pairs get converted into the Tree class which is a dict with helper functions.
 
 The parsing is done with the rakaly command line tool (https://github.com/rakaly/cli), because it is very fast and
 supports more quirks of the format than existing python tools. The location of rakaly must be configured with the
@@ -9,9 +9,11 @@ import json
 import os
 import re
 import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
 from pathlib import Path
-from collections.abc import Iterator, Mapping
-from tempfile import mkstemp
+from collections.abc import Iterator
 
 try:  # when used by PyHelpersForPDXWikis
     from PyHelpersForPDXWikis.localsettings import RAKALY_CLI
@@ -25,10 +27,18 @@ class ParsingWorkaround:
     The actual workarounds are in subclasses
     """
     replacement_regexes: dict[str, str]
+    # compiled versions of replacement_regexes. They are created once per subclass
+    _compiled_regexes: list[tuple[re.Pattern, str]]
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if 'replacement_regexes' in cls.__dict__:
+            cls._compiled_regexes = [(re.compile(pattern), replacement)
+                                     for pattern, replacement in cls.replacement_regexes.items()]
 
     def apply_to_string(self, file_contents):
-        for pattern, replacement in self.replacement_regexes.items():
-            file_contents = re.sub(pattern, replacement, file_contents)
+        for pattern, replacement in self._compiled_regexes:
+            file_contents = pattern.sub(replacement, file_contents)
         return file_contents
 
 
@@ -51,9 +61,14 @@ class ParadoxParser:
                             their parameters to be relative to this base_folder
         """
         self.base_folder = base_folder
+        # parsed files by (path, modification time, workaround classes). Only files which were parsed with
+        # cache=True are stored. See _really_parse_file()
+        self._cache: dict[tuple, Tree] = {}
 
-    def parse_files(self, glob: str, workarounds: list[ParsingWorkaround] = None) -> Iterator[tuple[Path, 'Tree']]:
-        """Generator to parse all files which match the glob with rakaly. The files are parsed in alphabetical order.
+    def parse_files(self, glob: str, workarounds: list[ParsingWorkaround] = None,
+                    cache=False) -> Iterator[tuple[Path, 'Tree']]:
+        """Generator to parse all files which match the glob with rakaly. The files are parsed concurrently, but the
+        results are yielded in alphabetical order of the files.
 
         If there are duplicate keys, their values will be grouped into a list(rakaly --duplicate-keys group).
         Such a list can be unwrapped with Tree.find_all() or merged with Tree.merge_duplicate_keys().
@@ -61,12 +76,16 @@ class ParadoxParser:
         Args:
             glob: a file pattern which is relative to the base_folder. See pathlib.Path.globs for the supported format
             workarounds: workarounds to apply before handling the file to rakaly
+            cache: keep the results, so that parsing the same files again with cache=True doesn't run rakaly again.
+                This should only be used for files which are actually parsed more than once, because the cached
+                Trees are kept as long as the ParadoxParser exists
 
         Returns:
-            An iterator over tuples of the file path and a Tree with the result
+            An iterator over tuples of the file path and a Tree with the result. If cache is True, the Trees are
+            shallow copies of the cached Trees. Their top level can be modified, but nested Trees and lists are shared
+            with the cache and must not be modified. Without cache, the Trees are not shared and can be modified
         """
-        for file in sorted(self.base_folder.glob(glob)):
-            yield file, self._really_parse_file(file, workarounds)
+        yield from self._parse_files_in_parallel(sorted(self.base_folder.glob(glob)), workarounds, cache)
 
     def parse_folder_as_one_file(self, folder: str, recursive=True, file_extension='txt',
                                  workarounds: list[ParsingWorkaround] = None,
@@ -88,26 +107,27 @@ class ParadoxParser:
                 into a list.
 
         Returns:
-            the merged Tree
+            the merged Tree. The files are not cached, so the Tree is not shared and can be modified
         """
         result = Tree({})
         glob = '*.' + file_extension
         if recursive:
             glob = '**/' + glob
-        for file in sorted((self.base_folder / folder).glob(glob)):
+        # the files are parsed in parallel, but merged in alphabetical order
+        for file, tree in self._parse_files_in_parallel(sorted((self.base_folder / folder).glob(glob)), workarounds):
             if overwrite_duplicate_toplevel_keys:
-                result.dictionary.update(self._really_parse_file(file, workarounds).dictionary)
+                result |= tree
             else:
-                for key, value in self._really_parse_file(file, workarounds):
-                    if key in result.dictionary:
-                        if isinstance(result.dictionary[key], Tree):
-                            result.dictionary[key].dictionary.update(value)
-                        elif isinstance(result.dictionary[key], list):
-                            result.dictionary[key].append(value)
+                for key, value in tree:
+                    if key in result:
+                        if isinstance(result[key], Tree):
+                            result[key].update(value)
+                        elif isinstance(result[key], list):
+                            result[key].append(value)
                         else:
-                            result.dictionary[key] = [result.dictionary[key], value]
+                            result[key] = [result[key], value]
                     else:
-                        result.dictionary[key] = value
+                        result[key] = value
         return result
 
     def parse_file(self, relative_path: str, workarounds: list[ParsingWorkaround] = None) -> 'Tree':
@@ -121,91 +141,133 @@ class ParadoxParser:
             workarounds: workarounds to apply before handling the file to rakaly
 
         Returns:
-            the parsed file as a Tree
+            the parsed file as a Tree. The file is not cached, so the Tree is not shared and can be modified
         """
         return self._really_parse_file(self.base_folder / relative_path, workarounds)
 
-    def _really_parse_file(self, file: Path, workarounds: list[ParsingWorkaround] = None) -> 'Tree':
+    def _parse_files_in_parallel(self, files: list[Path], workarounds: list[ParsingWorkaround] = None,
+                                 cache=False) -> Iterator[tuple[Path, 'Tree']]:
+        """Parse the files with one rakaly process per file, but run up to one process per cpu at the same time.
+
+        The threads mostly wait for the rakaly processes, which doesn't hold the GIL, but the json output is decoded
+        in the threads as well and that holds the GIL. The results are returned in the same order as the files.
+
+        Only a limited number of files is submitted ahead of the consumer, so that stopping the iteration early or
+        an exception only has to wait for the rakaly processes which are already running.
+        """
+        max_workers = os.cpu_count() or 1
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            remaining_files = iter(files)
+            pending = deque((file, executor.submit(self._really_parse_file, file, workarounds, cache))
+                            for file in islice(remaining_files, 2 * max_workers))
+            while pending:
+                file, future = pending.popleft()
+                next_file = next(remaining_files, None)
+                if next_file is not None:
+                    pending.append((next_file, executor.submit(self._really_parse_file, next_file, workarounds, cache)))
+                yield file, future.result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _really_parse_file(self, file: Path, workarounds: list[ParsingWorkaround] = None, cache=False) -> 'Tree':
+        """parse the file. If cache is True, the result from a previous cached call is returned if the file was not
+        modified since then
+
+        the result is a shallow copy of the cached Tree so that top level changes don't affect the cache. Nested
+        values are shared and must not be modified"""
+        if not cache:
+            return self._parse_file_with_rakaly(file, workarounds)
+        cache_key = (file, file.stat().st_mtime_ns, tuple(type(workaround) for workaround in workarounds or ()))
+        if cache_key not in self._cache:
+            self._cache[cache_key] = self._parse_file_with_rakaly(file, workarounds)
+        return Tree(self._cache[cache_key])
+
+    def _parse_file_with_rakaly(self, file: Path, workarounds: list[ParsingWorkaround] = None) -> 'Tree':
         if workarounds:
-            with open(file) as fp:
-                contents = fp.read()
+            # surrogateescape keeps bytes which are not valid utf-8 unchanged
+            contents = str(file.read_bytes(), 'UTF-8', 'surrogateescape')
             for workaround in workarounds:
                 contents = workaround.apply_to_string(contents)
-            fp, temp_filename = mkstemp(prefix='paradox_parser_workaround', suffix='.txt')
-            try:
-                with os.fdopen(fp, mode='w') as temp_file:
-                    temp_file.write(contents)
-                return self._run_rakaly(Path(temp_filename))
-            finally:
-                os.remove(temp_filename)
+            return self._run_rakaly(file, contents.encode('UTF-8', 'surrogateescape'))
         else:
             return self._run_rakaly(file)
 
-    def _run_rakaly(self, file: Path):
-        rakaly_result = subprocess.run([RAKALY_CLI, 'json', '--duplicate-keys', 'group', file], capture_output=True)
+    def _run_rakaly(self, file: Path, data: bytes = None):
+        """run rakaly on the file or, if data is given, pass the data to rakaly via stdin
+
+        the file is used in error messages in both cases"""
+        if data is None:
+            rakaly_result = subprocess.run([RAKALY_CLI, 'json', '--duplicate-keys', 'group', file], capture_output=True)
+        else:
+            rakaly_result = subprocess.run([RAKALY_CLI, 'json', '--duplicate-keys', 'group', '-'], input=data,
+                                           capture_output=True)
         if rakaly_result.returncode != 0:
             rakaly_error_message = str(rakaly_result.stderr, 'UTF-8')[:-1]  # [:-1] removes the final linebreak
             raise Exception('Error reading "{}": {}'.format(file, rakaly_error_message))
         return self._parse_json(rakaly_result.stdout)
 
-    def _parse_json(self, rakaly_result: str) -> 'Tree':
-        return json.loads(rakaly_result, object_hook=lambda x: Tree(x))
-
+    def _parse_json(self, rakaly_result: bytes) -> 'Tree':
+        return _json_decoder.decode(str(rakaly_result, 'UTF-8'))
 
-class Tree(Mapping):
-    """A wrapper around dict with some helper functions"""
 
-    def __init__(self, dictionary: dict):
-        self.dictionary = dictionary
+class Tree(dict):
+    """A dict with some helper functions
 
-    def __getitem__(self, key):
-        return self.dictionary[key]
+    Subclassing dict instead of wrapping it lets lookups, len() and the in operator use the C implementation of dict
+    """
+    # no __dict__ per instance, because there are a lot of trees
+    __slots__ = ()
 
-    def __len__(self) -> int:
-        return len(self.dictionary)
+    @property
+    def dictionary(self) -> dict:
+        """the Tree itself. It is kept for code which was written when Tree was a wrapper around a dict"""
+        return self
 
     def __iter__(self) -> Iterator:
         """iterates over the items of the dictionary.
 
-        This is the same as Tree.dictionary.items(), but it avoids the items() call for the common case
+        This is the same as Tree.items(), but it avoids the items() call for the common case
         that we want to iterate over the items.
         """
-        return iter(self.dictionary.items())
-
-    def keys(self):
-        return self.dictionary.keys()
+        return iter(self.items())
 
     def get_or_default(self, key: str, default: any):
         """Return the value for the given key or the default if the key is not in this Tree"""
-        if key in self.dictionary:
-            return self.dictionary[key]
-        else:
-            return default
+        return self.get(key, default)
 
     def find_all(self, search_key: str) -> Iterator:
         """Iterates over the values for this search_key.
 
         This is most useful for files which may or may not contain the same key multiple times
         """
-        if search_key not in self.dictionary:
+        if search_key not in self:
             return
-        if isinstance(self.dictionary[search_key], list):
-            for entry in self.dictionary[search_key]:
+        if isinstance(self[search_key], list):
+            for entry in self[search_key]:
                 yield entry
         else:
-            yield self.dictionary[search_key]
+            yield self[search_key]
 
     def find_all_recursively(self, search_key: str) -> Iterator:
-        """Like find_all, but searches the whole Tree recursively"""
-        for key, value in self.dictionary.items():
-            if key == search_key:
-                yield value
-            elif isinstance(value, Tree):
-                yield from value.find_all_recursively(search_key)
-            elif isinstance(value, list):
-                for item in value:
-                    if isinstance(item, Tree):
-                        yield from item.find_all_recursively(search_key)
+        """Like find_all, but searches the whole Tree recursively
+
+        The search uses an explicit stack of iterators instead of recursive generators. The values are found in the
+        same order as a depth-first recursion would find them"""
+        stack = [iter(self.items())]
+        while stack:
+            for key, value in stack[-1]:
+                if key == search_key:
+                    yield value
+                elif isinstance(value, Tree):
+                    stack.append(iter(value.items()))
+                    break
+                elif isinstance(value, list):
+                    stack.append(chain.from_iterable(item.items() for item in value if isinstance(item, Tree)))
+                    break
+            else:
+                # the iterator on the top of the stack is exhausted
+                stack.pop()
 
     def merge_duplicate_keys(self):
         """merges duplicate keys which have Tree as their value
@@ -213,11 +275,15 @@ class Tree(Mapping):
         if the values have duplicate keys, the last one will overwrite the previous ones
         @TODO: it might be useful to change this
         """
-        for key, value in self.dictionary.items():
+        for key, value in self.items():
             if isinstance(value, list) and isinstance(value[0], Tree):
                 merged = Tree({})
                 for item in value:
-                    merged.dictionary.update(item.dictionary)
-                self.dictionary[key] = merged
+                    merged.update(item)
+                self[key] = merged
         return self
 
+
+# shared decoder which creates Tree objects directly. Passing the class instead of a lambda avoids one python call
+# per json object and the decoder doesn't have to be recreated for every file
+_json_decoder = json.JSONDecoder(object_hook=Tree)
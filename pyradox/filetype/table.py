@@ -128,20 +128,28 @@ def make_table(tree, dialect, column_specs = None, filter_function = None, sort_
     table_row = dialect.header_begin + dialect.header_cell_delimiter.join(table_row) + dialect.header_end
     table_rows.append(table_row)
         
+    # everything which only depends on the column specs and the dialect is looked up once per table instead of once per cell
+    format_specs = [format_spec for _, format_spec in column_specs]
+    row_cell_begin = dialect.row_cell_begin
+    row_cell_end = dialect.row_cell_end
+    row_cell_delimiter = dialect.row_cell_delimiter
+    row_end = dialect.row_end
+    row_begin = dialect.row_begin
+    row_begin_is_callable = callable(row_begin)
+
     for key, row in rows:
         table_row = []
-        for _, format_spec in column_specs:
+        for format_spec in format_specs:
             try:
                 cell_contents = apply_format_spec(key, row, format_spec)
-                cell_contents = dialect.row_cell_begin(cell_contents) + cell_contents + dialect.row_cell_end
-                table_row.append(cell_contents)
+                table_row.append(row_cell_begin(cell_contents) + cell_contents + row_cell_end)
             except KeyError:
                 pass
-        if callable(dialect.row_begin):
-            table_row_str = dialect.row_begin(row)
+        if row_begin_is_callable:
+            table_row_str = row_begin(row)
         else:
-            table_row_str = dialect.row_begin
-        table_row_str += dialect.row_cell_delimiter.join(table_row) + dialect.row_end
+            table_row_str = row_begin
+        table_row_str += row_cell_delimiter.join(table_row) + row_end
         table_rows.append(table_row_str)
     
     table += dialect.row_delimiter.join(table_rows)
@@ -161,14 +169,14 @@ def make_tables(tree, dialect, split_function, filter_function = None, *args, **
             split_id = split_function(key, row)
             split_set.add(split_id)
         
-    result = ''
+    tables = []
     
     for split_id in sorted(split_set):
         filter_function = lambda k, v: split_function(k, v) == split_id
-        result += make_table(tree, dialect, filter_function = filter_function, *args, **kwargs)
-        result += '\n'
+        tables.append(make_table(tree, dialect, filter_function = filter_function, *args, **kwargs))
+        tables.append('\n')
     
-    return result
+    return ''.join(tables)
     
 def apply_format_spec(key, row, format_spec):
     """
@@ -26,7 +26,7 @@ class ArticleGenerator(Vic3FileGenerator):
 
     def generate_articles(self):
         self.concepts = {}
-        self.text_formatter = Vic3WikiTextFormatter()
+        self.text_formatter = self.parser.formatter
         for concept_name, data in self.parser.parser.parse_file('common/game_concepts/00_game_concepts.txt'):
             if concept_name == 'concept_concept':  # we dont need it for the wiki, because it just explains concepts
                 continue
@@ -1,3 +1,4 @@
+from functools import cached_property
 from operator import attrgetter
 import re
 import os
@@ -5,10 +6,33 @@ import sys
 # add the parent folder to the path so that imports work even if this file gets executed directly
 sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 from vic3.vic3_file_generator import Vic3FileGenerator
-from vic3.vic3lib import ProductionMethod, NamedModifier, Building, Modifier, BuildingGroup
+from vic3.vic3lib import ProductionMethod, NamedModifier, Building, Modifier
+
+_INPUT_PER_LEVEL_RE = re.compile(r'(?<=}}) [-a-zA-Z ]* input per level')
+_OUTPUT_PER_LEVEL_RE = re.compile(r'(?<=}}) [-a-zA-Z ]* output per level')
+_ICON_AND_TEXT_RE = re.compile(r'\{\{icon\|([^}]+)}} \1', re.IGNORECASE)
+_MORTALITY_RE = re.compile(r'(.+) (\[\[[^|]+\|Mortality]]) of (.+)', re.IGNORECASE)
+_ICON_PATTERN = r'\{\{icon\|[^}]+}}'
+_MODIFIER_VALUE_AND_NAME_RE = re.compile(
+    r'(?P<value>(' + _ICON_PATTERN + r' )?(\{\{(green|red)\||\'\'\')[+−0-9.%]+(}}|\'\'\')( ' + _ICON_PATTERN + r')?) (?P<name>.*)')
 
 
 class BuildingTableGenerator(Vic3FileGenerator):
+    # notes for building group attributes which differ from their default value
+    notes_for_building_groups = {
+        'economy_of_scale': 'Has economy of scale',
+        'is_subsistence': 'Is a subsistence building',
+        'auto_place_buildings': 'Gets built automatically',
+        'capped_by_resources': 'Building level is limited by the available resources in the state',
+        'discoverable_resource': 'Resources can be discovered',
+        'depletable_resource': 'Resources can deplete',
+        'can_use_slaves': 'Can use slaves',
+        'fired_pops_become_radical': 'Fired pops don\'t become radical',
+        'pays_taxes': 'Pays no taxes',
+        'is_government_funded': 'Is government founded',
+        'created_by_trade_routes': 'Gets created by trade routes',
+    }
+
     def generate_all_buildings(self):
         sections = {}
         for category in ['development', 'rural', 'urban']:
@@ -35,31 +59,14 @@ class BuildingTableGenerator(Vic3FileGenerator):
         if building.building_group.land_usage == 'rural':
             notes.append('Uses arable land')
 
-        notes_for_building_groups = {
-            'economy_of_scale': 'Has economy of scale',
-            'is_subsistence': 'Is a subsistence building',
-            'auto_place_buildings': 'Gets built automatically',
-            'capped_by_resources': 'Building level is limited by the available resources in the state',
-            'discoverable_resource': 'Resources can be discovered',
-            'depletable_resource': 'Resources can deplete',
-            'can_use_slaves': 'Can use slaves',
-            'fired_pops_become_radical': 'Fired pops don\'t become radical',
-            'pays_taxes': 'Pays no taxes',
-            'is_government_funded': 'Is government founded',
-            'created_by_trade_routes': 'Gets created by trade routes',
-        }
-        for attribute, message in notes_for_building_groups.items():
-            if hasattr(building.building_group, attribute) and getattr(building.building_group, attribute) != \
-                    building.building_group.default_values[attribute]:
+        building_group = building.building_group
+        default_values = building_group.default_values
+        for attribute, message in self.notes_for_building_groups.items():
+            # a single getattr replaces the hasattr check. Missing attributes return the default value
+            if getattr(building_group, attribute, default_values[attribute]) != default_values[attribute]:
                 notes.append(message)
         return self.parser.formatter.create_wiki_list(notes)
 
-    def _get_topmost_bg(self, building: Building) -> BuildingGroup:
-        bg = building.building_group
-        while bg.parent_group is not None:
-            bg = bg.parent_group
-        return bg
-
     def generate_building_table(self, category: str = None, group: str = None):
         buildings_to_display = self.parser.buildings.values()
         if category is not None:
@@ -68,10 +75,16 @@ class BuildingTableGenerator(Vic3FileGenerator):
         if group is not None:
             buildings_to_display = [building for building in buildings_to_display if
                                     building.building_group.name == group]
+        # there are only a few categories, so they are localized once instead of once per building
+        category_names = {}
+        for building in buildings_to_display:
+            building_category = building.building_group.category
+            if building_category not in category_names:
+                category_names[building_category] = self.parser.localize(building_category.upper() + '_BUILDINGS')
         buildings = [{
             'Name': f'{{{{iconbox|{building.display_name}||image={building.get_wiki_filename()}}}}}\n',
-            'Category': self.parser.localize(building.building_group.category.upper() + '_BUILDINGS'),
-            'Group': self._get_topmost_bg(building).display_name,
+            'Category': category_names[building.building_group.category],
+            'Group': building.topmost_building_group.display_name,
             'Required technology': ' and '.join(
                 [tech.get_wiki_link_with_icon() for tech in building.required_technologies]),
             'Cost': building.required_construction,
@@ -108,22 +121,36 @@ class BuildingTableGenerator(Vic3FileGenerator):
         table = re.sub(r'^! Name.*', new_header, table, flags=re.MULTILINE)
         return self.get_SVersion_header() + '\n' + table
 
+    @cached_property
+    def _profession_per_level_regex(self) -> re.Pattern:
+        """matches the workforce modifiers of production methods"""
+        return re.compile('(' + '|'.join(
+            [pop_type.display_name_without_icon for pop_type in self.parser.pop_types.values()]) + ') per level',
+                          re.IGNORECASE)
+
+    @cached_property
+    def _buildings_by_group(self) -> dict[str, list[Building]]:
+        """returns a dictionary. keys are building group names and values are the buildings in them or their subgroups"""
+        buildings_by_group = {}
+        for building in self.parser.buildings.values():
+            for bg_name in building.building_groups_names_with_parents:
+                buildings_by_group.setdefault(bg_name, []).append(building)
+        return buildings_by_group
+
     def _group_pm_building_modifiers(self, pm: ProductionMethod, convert_to_wiki_list=True,
                                      include_timed_modifiers=True):
         result = {'input': [], 'output': [], 'workforce': [], 'other': []}
-        profession_per_level = re.compile('(' + '|'.join(
-            [pop_type.display_name_without_icon for pop_type in self.parser.pop_types.values()]) + ') per level',
-                                          re.IGNORECASE)
+        profession_per_level = self._profession_per_level_regex
         for scaling_type in ['workforce_scaled', 'level_scaled', 'throughput_scaled', 'unscaled']:
             if scaling_type in pm.building_modifiers:
                 for modifier in pm.building_modifiers[scaling_type]:
                     wiki_text = modifier.format_for_wiki()
                     if wiki_text.endswith(' input per level'):
-                        wiki_text = re.sub(r'(?<=}}) [-a-zA-Z ]* input per level', '', wiki_text)
+                        wiki_text = _INPUT_PER_LEVEL_RE.sub('', wiki_text)
                         wiki_text += self.get_scaling_type_reference(scaling_type, 'workforce_scaled')
                         result['input'].append(wiki_text)
                     elif wiki_text.endswith(' output per level'):
-                        wiki_text = re.sub(r'(?<=}}) [-a-zA-Z ]* output per level', '', wiki_text)
+                        wiki_text = _OUTPUT_PER_LEVEL_RE.sub('', wiki_text)
                         wiki_text += self.get_scaling_type_reference(scaling_type, 'workforce_scaled')
                         result['output'].append(wiki_text)
                     elif profession_per_level.search(wiki_text):
@@ -132,7 +159,7 @@ class BuildingTableGenerator(Vic3FileGenerator):
                         result['workforce'].append(wiki_text)
                     else:
                         # shorten icon + text to just the icon
-                        wiki_text = re.sub(r'\{\{icon\|([^}]+)}} \1', r'{{icon|\1}}', wiki_text, flags=re.IGNORECASE)
+                        wiki_text = _ICON_AND_TEXT_RE.sub(r'{{icon|\1}}', wiki_text)
                         wiki_text += self.get_scaling_type_reference(scaling_type, 'unscaled')
                         result['other'].append(wiki_text)
         if include_timed_modifiers:
@@ -173,13 +200,10 @@ class BuildingTableGenerator(Vic3FileGenerator):
         result = {}
         for modifier in modifiers:
             # shorten icon + text to just the icon
-            modifier = re.sub(r'\{\{icon\|([^}]+)}} \1', r'{{icon|\1}}', modifier, flags=re.IGNORECASE)
+            modifier = _ICON_AND_TEXT_RE.sub(r'{{icon|\1}}', modifier)
             # move mortality to the end
-            modifier = re.sub(r'(.+) (\[\[[^|]+\|Mortality]]) of (.+)', r'\3 \1 \2', modifier, flags=re.IGNORECASE)
-            icon_re = r'\{\{icon\|[^}]+}}'
-            match = re.match(
-                r'(?P<value>(' + icon_re + r' )?(\{\{(green|red)\||\'\'\')[+−0-9.%]+(}}|\'\'\')( ' + icon_re + r')?) (?P<name>.*)',
-                modifier)
+            modifier = _MORTALITY_RE.sub(r'\3 \1 \2', modifier)
+            match = _MODIFIER_VALUE_AND_NAME_RE.match(modifier)
             if match:
                 name = match.group('name')
                 if name not in result:
@@ -211,37 +235,47 @@ class BuildingTableGenerator(Vic3FileGenerator):
             excluded_pms = []
         pms_to_display = {pm.name: pm for building in buildings_to_display for pm in building.production_methods if
                           pm.name not in excluded_pms}
+        # production methods with the same name are always displayed together. They are removed from
+        # pms_to_display together as well, so the groups stay complete while the tables are generated
+        pms_by_display_name = {}
+        for pm in pms_to_display.values():
+            if pm.display_name not in pms_by_display_name:
+                pms_by_display_name[pm.display_name] = []
+            pms_by_display_name[pm.display_name].append(pm)
+        format_localization_text = self.parser.formatter.format_localization_text
+        production_method_groups = self.parser.production_method_groups
         pmgs_to_display = {}
         for pm in pms_to_display.values():
             for pmg in pm.groups:
-                display_name = self.parser.formatter.format_localization_text(pmg.display_name, [])
+                display_name = format_localization_text(pmg.display_name, [])
                 if display_name not in pmgs_to_display:
                     pmgs_to_display[display_name] = []
                 if pmg not in pmgs_to_display[display_name]:
                     pmgs_to_display[display_name].append(pmg)
         ordered_pms_to_display = []
         result = ''
+        pm_group_tables = []
         for building in buildings_to_display:
             for pmg_name in building.production_method_groups:
                 # handle all production method groups with the same name together
-                pmg_display_name = self.parser.formatter.format_localization_text(
-                    self.parser.production_method_groups[pmg_name].display_name, [])
+                pmg_display_name = format_localization_text(production_method_groups[pmg_name].display_name, [])
                 for pmg in pmgs_to_display[pmg_display_name]:
                     for pm_name in pmg.production_methods:
                         if pm_name in pms_to_display:
                             pm = pms_to_display[pm_name]
-                            pms_with_same_name = [same_name_pm for same_name_pm in pms_to_display.values() if
-                                                  same_name_pm.display_name == pm.display_name]
-                            for same_name_pm in pms_with_same_name:
+                            for same_name_pm in pms_by_display_name[pm.display_name]:
                                 ordered_pms_to_display.append(same_name_pm)
                                 del pms_to_display[same_name_pm.name]
                 if one_table_per_pm_group and len(ordered_pms_to_display) > 0:
-                    result += f'==={pmg_display_name}===\n{self.generate_building_pms_for_specific_pms(buildings_to_display, ordered_pms_to_display, split_up_modifiers)}'
+                    pm_group_tables.append(f'==={pmg_display_name}===\n{self.generate_building_pms_for_specific_pms(buildings_to_display, ordered_pms_to_display, split_up_modifiers)}')
                     ordered_pms_to_display = []
 
-            if not one_table_per_pm_group:
-                result = self.generate_building_pms_for_specific_pms(buildings_to_display, ordered_pms_to_display,
-                                                                     split_up_modifiers)
+        if one_table_per_pm_group:
+            result = ''.join(pm_group_tables)
+        elif len(buildings_to_display) > 0:
+            # the single table contains the production methods of all buildings, so it is generated once at the end
+            result = self.generate_building_pms_for_specific_pms(buildings_to_display, ordered_pms_to_display,
+                                                                 split_up_modifiers)
 
         return self.get_SVersion_header(scope='table') + '\n' + result
 
@@ -262,31 +296,32 @@ class BuildingTableGenerator(Vic3FileGenerator):
         else:
             include_timed_modifiers = True
         if split_up_modifiers:
-            split_up_modifiers_keys = []
+            # the split up modifiers are needed for the column keys and for the rows, but they are only computed once
+            split_up_modifiers_by_pm = {}
+            split_up_modifiers_keys = {}
             for pm in ordered_pms_to_display:
-                for key in self._split_up_modifiers(pm, include_timed_modifiers=include_timed_modifiers).keys():
-                    if key not in split_up_modifiers_keys:
-                        split_up_modifiers_keys.append(key)
+                split_up_modifiers_by_pm[pm.name] = self._split_up_modifiers(pm, include_timed_modifiers=include_timed_modifiers)
+                split_up_modifiers_keys.update(dict.fromkeys(split_up_modifiers_by_pm[pm.name]))
+        # set for the membership tests in the buildings column
+        displayed_buildings = set(buildings_to_display)
         pms = []
         for pm in ordered_pms_to_display:
+            # all columns share the result, so that the modifiers are only grouped once per pm
+            grouped_building_modifiers = self._group_pm_building_modifiers(pm, include_timed_modifiers=include_timed_modifiers)
             pm_dict = {
                 'id': pm.name,
                 'Name': f'{{{{iconbox|{pm.display_name}||image={pm.get_wiki_filename()}}}}}',
                 'Requirements': self._get_pm_requirements_list(pm),
-                'Workforce<ref name="level_scaled" />':
-                    self._group_pm_building_modifiers(pm, include_timed_modifiers=include_timed_modifiers)['workforce'],
-                'Input<ref name="workforce_scaled" />':
-                    self._group_pm_building_modifiers(pm, include_timed_modifiers=include_timed_modifiers)['input'],
-                'Output<ref name="workforce_scaled" />':
-                    self._group_pm_building_modifiers(pm, include_timed_modifiers=include_timed_modifiers)['output'],
+                'Workforce<ref name="level_scaled" />': grouped_building_modifiers['workforce'],
+                'Input<ref name="workforce_scaled" />': grouped_building_modifiers['input'],
+                'Output<ref name="workforce_scaled" />': grouped_building_modifiers['output'],
             }
             if split_up_modifiers:
-                modifiers = self._split_up_modifiers(pm, include_timed_modifiers=include_timed_modifiers)
+                modifiers = split_up_modifiers_by_pm[pm.name]
                 for key in split_up_modifiers_keys:
-                    pm_dict[key] = modifiers[key] if key in modifiers else ''
+                    pm_dict[key] = modifiers.get(key, '')
             else:
-                pm_dict['Building modifiers'] = \
-                self._group_pm_building_modifiers(pm, include_timed_modifiers=include_timed_modifiers)['other']
+                pm_dict['Building modifiers'] = grouped_building_modifiers['other']
                 pm_dict['Country modifiers<ref name="workforce_scaled" />'] = self._get_modifier_list(
                     pm.country_modifiers, default_scaling_type='workforce_scaled')
                 pm_dict['State modifiers<ref name="workforce_scaled" />'] = self._get_modifier_list(pm.state_modifiers,
@@ -294,12 +329,12 @@ class BuildingTableGenerator(Vic3FileGenerator):
             if len(buildings_to_display) > 1:
                 pm_dict['Buildings'] = self.parser.formatter.create_wiki_list(
                     [b.get_wiki_link_with_icon() for b in sorted(pm.buildings, key=attrgetter('display_name')) if
-                     b in buildings_to_display])
+                     b in displayed_buildings])
             pms.append(pm_dict)
             # sorted(pms_to_display,
             #                key=lambda pm: (pm.groups[0].name, pm.display_name)
             #                # key=lambda pm:ProductionMethod(pm.buildings[0].building_group.category,
-            #                #                                                                         self._get_topmost_bg(pm.buildings[0]).display_name,
+            #                #                                                                         pm.buildings[0].topmost_building_group.display_name,
             #                #                                                                         pm.buildings[0].display_name,
             #                #                                                                         pm.display_name)
             #                )]
@@ -382,17 +417,17 @@ class BuildingTableGenerator(Vic3FileGenerator):
 
     def generate_building_pms_helper(self, building_group: str = None, buildings: list = None, one_table_per_building=False):
         if building_group:
-            buildings = [b for b in self.parser.buildings.values() if
-                         building_group in b.building_groups_names_with_parents]
+            buildings = self._buildings_by_group.get(building_group, [])
         if isinstance(buildings[0], str):
             buildings = [self.parser.buildings[b] for b in buildings]
         buildings = sorted(buildings, key=attrgetter('display_name'))
         if one_table_per_building:
-            result = ''
+            parts = []
             for building in buildings:
                 if len(buildings) > 1:
-                    result += f'=== {building.display_name} ===\n'
-                result += self.generate_building_pms([building], split_up_modifiers=True) + '\n'
+                    parts.append(f'=== {building.display_name} ===\n')
+                parts.append(self.generate_building_pms([building], split_up_modifiers=True) + '\n')
+            result = ''.join(parts)
         else:
             result = self.generate_building_pms(buildings, split_up_modifiers=True, one_table_per_pm_group=True) + '\n'
         return result
@@ -27,17 +27,24 @@ class TableGenerator(Vic3FileGenerator):
         return ', '.join(notes)
 
     def generate_country_table(self):
-        countries = [{
-            '': f'id="{c.display_name}" style="width: 2px; background-color: {c.color.css_color_string}"|' + ("".join([f"{{{{anchor|{name}}}}}" for name in self.parser.dynamic_country_names[c.tag]]) if c.tag in self.parser.dynamic_country_names else ""),
-            'width="10%" | Name': f"[[File:{c.display_name}.png|48px|border]] '''{c.display_name}'''" + (f'<br/><small>Other names: {", ".join(self.parser.dynamic_country_names[c.tag])}</small>' if c.tag in self.parser.dynamic_country_names else ""),
-            'Tag': f'{c.tag}',
-            'Type': self.parser.localize(c.type),
-            'Tier': self.parser.localize('country_tier_' + c.tier),
-            'Capital state': c.capital_state.display_name if c.capital_state is not None else '',
-            'Region': c.capital_state.get_strategic_region().display_name if c.capital_state is not None else '',
-            'Cultures': ', '.join(self.parser.localize(culture) for culture in c.cultures),
-            'Notes': self.get_country_notes(c),
-        } for c in sorted(self.parser.countries.values(), key=attrgetter("display_name"))]
+        countries = []
+        all_dynamic_names = self.parser.dynamic_country_names
+        for c in sorted(self.parser.countries.values(), key=attrgetter("display_name")):
+            # values which are used by multiple columns are only looked up once
+            name = c.display_name
+            dynamic_names = all_dynamic_names.get(c.tag)
+            capital_state = c.capital_state
+            countries.append({
+                '': f'id="{name}" style="width: 2px; background-color: {c.color.css_color_string}"|' + ("".join([f"{{{{anchor|{dynamic_name}}}}}" for dynamic_name in dynamic_names]) if dynamic_names is not None else ""),
+                'width="10%" | Name': f"[[File:{name}.png|48px|border]] '''{name}'''" + (f'<br/><small>Other names: {", ".join(dynamic_names)}</small>' if dynamic_names is not None else ""),
+                'Tag': f'{c.tag}',
+                'Type': self.parser.localize(c.type),
+                'Tier': self.parser.localize('country_tier_' + c.tier),
+                'Capital state': capital_state.display_name if capital_state is not None else '',
+                'Region': capital_state.get_strategic_region().display_name if capital_state is not None else '',
+                'Cultures': ', '.join(self.parser.localize(culture) for culture in c.cultures),
+                'Notes': self.get_country_notes(c),
+            })
 
         return self.get_SVersion_header() + '\n' + self.make_wiki_table(countries)
 
@@ -146,18 +153,6 @@ class TableGenerator(Vic3FileGenerator):
 
 
     def generate_state_table(self) -> str:
-        arable_resource = {building.building_group.name: building.get_wiki_file_tag()
-                           for building in sorted(self.parser.buildings.values(), key=attrgetter('display_name'))
-                           if building.building_group.land_usage == 'rural'
-                           and not building.building_group.is_subsistence}
-        capped_resources = {building.building_group.name: building.get_wiki_file_tag()
-                            for building in sorted(self.parser.buildings.values(), key=attrgetter('display_name'))
-                            if building.building_group.capped_by_resources
-                            and not building.building_group.discoverable_resource}
-        dicoverable_resources = {building.building_group.name: building.get_wiki_file_tag()
-                                 for building in sorted(self.parser.buildings.values(), key=attrgetter('display_name'))
-                                 if building.building_group.capped_by_resources
-                                 and building.building_group.discoverable_resource}
         states = []
         for state in self.parser.states.values():
             if state.is_water():
@@ -172,12 +167,6 @@ class TableGenerator(Vic3FileGenerator):
                 'Homelands': ', '.join([self.parser.localize(culture) for culture in state.homelands]),
                 'Owners': ', '.join(
                     [f'{{{{flag|{self.parser.countries[tag].display_name}}}}}' for tag in state.owners])}
-            # for bg_name, building_icon in (arable_resource | capped_resources | dicoverable_resources).items():
-            #     if bg_name in state.resources:
-            #         amount = f'{state.resources[bg_name].get_max_amount()} {building_icon}'
-            #     else:
-            #         amount = ''
-            #     table_entry[building_icon] = amount
             table_entry['Traits'] = self.create_wiki_list([trait.get_wiki_link_with_icon() for trait in state.traits])
             states.append(table_entry)
         table = self.make_wiki_table(states,
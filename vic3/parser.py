@@ -8,6 +8,8 @@ from common.paradox_lib import NameableEntity
 AE = TypeVar('AE', bound=AdvancedEntity)
 NE = TypeVar('NE', bound=NameableEntity)
 
+_LOCALISATION_LINE_RE = re.compile(r'\s*([^#\s:]+):\d?\s*"(.*)"[^"]*')
+
 
 class Vic3Parser:
     """Parses Victoria 3 game data into objects of the vic3lib module.
@@ -24,6 +26,20 @@ class Vic3Parser:
     # allows the overriding of localisation strings
     localizationOverrides = {'recognized': 'Recognized'}  # there doesn't seem to be a localization for this
 
+    # keys in the building group files which are passed on to BuildingGroup
+    building_group_keys = frozenset(['category', 'always_possible', 'economy_of_scale', 'is_subsistence',
+                                     'auto_place_buildings', 'capped_by_resources',
+                                     'discoverable_resource', 'depletable_resource', 'can_use_slaves', 'land_usage',
+                                     'cash_reserves_max', 'stateregion_max_level',
+                                     'urbanization', 'hiring_rate', 'proportionality_limit',
+                                     'hires_unemployed_only', 'infrastructure_usage_per_level',
+                                     'fired_pops_become_radical', 'pays_taxes', 'is_government_funded',
+                                     'created_by_trade_routes', 'subsidized', 'is_military', 'default_building'])
+    # keys in the building group files which are not used by us
+    ignored_building_group_keys = frozenset(['lens', 'inheritable_construction', 'should_auto_expand',
+                                             'economy_of_scale_ai_factor'])
+    pm_modifier_scaling_types = frozenset(['workforce_scaled', 'level_scaled', 'throughput_scaled', 'unscaled'])
+
     def __init__(self):
         self.parser = ParadoxParser(VIC3DIR / 'game')
 
@@ -33,9 +49,11 @@ class Vic3Parser:
         for path in (VIC3DIR / 'game' / 'localization' / 'english').glob('**/*_l_english.yml'):
             with path.open(encoding='utf-8-sig') as f:
                 for line in f:
-                    match = re.fullmatch(r'\s*([^#\s:]+):\d?\s*"(.*)"[^"]*', line)
+                    match = _LOCALISATION_LINE_RE.fullmatch(line)
                     if match:
                         localisation_dict[match.group(1)] = match.group(2)
+        # the overrides are merged once, so that localize() only needs a single lookup
+        localisation_dict.update(self.localizationOverrides)
         return localisation_dict
 
     def localize(self, key: str, default: str = None) -> str:
@@ -47,10 +65,7 @@ class Vic3Parser:
         if default is None:
             default = key
 
-        if key in self.localizationOverrides:
-            return self.localizationOverrides[key]
-        else:
-            return self._localisation_dict.get(key, default)
+        return self._localisation_dict.get(key, default)
 
     def parse_nameable_entities(self, folder: str, entity_class: Type[NE],
                                 extra_data_functions: dict[str, Callable[[str, Tree], any]] = None,
@@ -151,8 +166,8 @@ class Vic3Parser:
     def existing_tags(self):
         """returns a set of tags which exist at the start of the game"""
         tags = set()
-        for file, data in self.parser.parse_files('common/history/states/*'):
-            for state, state_data in data['STATES']:
+        for file, data in self.parser.parse_files('common/history/states/*', cache=True):
+            for state_data in data['STATES'].values():
                 for create_section in state_data.find_all('create_state'):
                     tags.add(create_section['country'].split(':')[1])
         return tags
@@ -162,7 +177,7 @@ class Vic3Parser:
         """returns a set of tags which can be formed"""
         tags = set()
         for file, data in self.parser.parse_files('common/country_formation/*'):
-            a = data.dictionary.keys()
+            a = data.keys()
             tags.update(a)
         return tags
 
@@ -171,7 +186,7 @@ class Vic3Parser:
         """returns a set of tags which can be released"""
         tags = set()
         for file, data in self.parser.parse_files('common/country_creation/*'):
-            a = data.dictionary.keys()
+            a = data.keys()
             tags.update(a)
         return tags
 
@@ -179,7 +194,7 @@ class Vic3Parser:
     def event_releasable_tags(self):
         """tags which get created by create_country"""
         tags = set()
-        for file, data in self.parser.parse_files('events/**/*.txt'):
+        for file, data in self.parser.parse_files('events/**/*.txt', cache=True):
             for create_country_section in data.find_all_recursively('create_country'):
                 tags.add(create_country_section['tag'])
         return tags
@@ -188,7 +203,7 @@ class Vic3Parser:
     def event_formed_tags(self):
         """tags which get formed with change_tag"""
         tags = set()
-        for file, data in self.parser.parse_files('events/**/*.txt'):
+        for file, data in self.parser.parse_files('events/**/*.txt', cache=True):
             for tag in data.find_all_recursively('change_tag'):
                 tags.add(tag)
         return tags
@@ -223,7 +238,7 @@ class Vic3Parser:
         """returns a dictionary. keys are STATE_ strings and values are State objects."""
         owners = {}
         homelands = {}
-        for file, history_data in self.parser.parse_files('common/history/states/*.txt'):
+        for file, history_data in self.parser.parse_files('common/history/states/*.txt', cache=True):
             for name, state_data in history_data['STATES']:
                 name_without_prefix = name.removeprefix('s:')
                 owners[name_without_prefix] = [create_data['country'].removeprefix('c:') for create_data in
@@ -263,7 +278,7 @@ class Vic3Parser:
         for name_with_s, state in self.parser.parse_folder_as_one_file('common/history/pops', overwrite_duplicate_toplevel_keys=False)['POPS']:
             state_name = name_with_s.removeprefix('s:')
             state_populations[state_name] = 0
-            for region_state_name, region_state in state:
+            for region_state in state.values():
                 for create_pop in region_state.find_all('create_pop'):
                     state_populations[state_name] += create_pop['size']
         return state_populations
@@ -361,18 +376,11 @@ class Vic3Parser:
         for name, data in self.parser.parse_folder_as_one_file('common/building_groups'):
             entity_values = {}
             for k, v in data:
-                if k in ['category', 'always_possible', 'economy_of_scale', 'is_subsistence',
-                         'auto_place_buildings', 'capped_by_resources',
-                         'discoverable_resource', 'depletable_resource', 'can_use_slaves', 'land_usage',
-                         'cash_reserves_max', 'stateregion_max_level',
-                         'urbanization', 'hiring_rate', 'proportionality_limit',
-                         'hires_unemployed_only', 'infrastructure_usage_per_level', 'fired_pops_become_radical',
-                         'pays_taxes', 'is_government_funded', 'created_by_trade_routes', 'subsidized', 'is_military',
-                         'default_building']:
+                if k in self.building_group_keys:
                     entity_values[k] = v
                 elif k == 'parent_group':
                     entity_values['parent_group'] = building_groups[v]
-                elif k in ['lens', 'inheritable_construction', 'should_auto_expand', 'economy_of_scale_ai_factor']:
+                elif k in self.ignored_building_group_keys:
                     pass
                 else:
                     raise Exception('Unsupported key {} when parsing BuildingGroup "{}"'.format(k, name))
@@ -383,7 +391,7 @@ class Vic3Parser:
     def _parse_pm_modifiers(self, modifier_section: Tree):
         result = {}
         for scaling_type, modifiers in modifier_section:
-            if scaling_type not in ['workforce_scaled', 'level_scaled', 'throughput_scaled', 'unscaled']:
+            if scaling_type not in self.pm_modifier_scaling_types:
                 raise Exception('Unknow scaling "{}"'.format(scaling_type))
             result[scaling_type] = self._parse_modifier_data(modifiers)
         return result
@@ -409,6 +417,24 @@ class Vic3Parser:
     def production_method_groups(self):
         return self.parse_advanced_entities('common/production_method_groups', ProductionMethodGroup)
 
+    @cached_property
+    def production_method_groups_by_pm(self) -> dict[str, list[ProductionMethodGroup]]:
+        """returns a dictionary. keys are production method names and values are the groups which contain them."""
+        groups_by_pm = {}
+        for group in self.production_method_groups.values():
+            for pm_name in dict.fromkeys(group.production_methods):
+                groups_by_pm.setdefault(pm_name, []).append(group)
+        return groups_by_pm
+
+    @cached_property
+    def states_by_trait(self) -> dict[str, list[State]]:
+        """returns a dictionary. keys are state trait names and values are the states which have them."""
+        states_by_trait = {}
+        for state in self.states.values():
+            for trait in dict.fromkeys(state.traits):
+                states_by_trait.setdefault(trait.name, []).append(state)
+        return states_by_trait
+
     @cached_property
     def technologies(self) -> dict[str, Technology]:
         entities = {}
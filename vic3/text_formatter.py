@@ -6,11 +6,124 @@ from common.wiki import WikiTextFormatter
 from vic3.vic3_file_generator import vic3game, Vic3FileGenerator
 from vic3.vic3lib import AdvancedEntity
 
+_CONCEPT_RE = re.compile(
+    r"(?<!\[)\[\s*(Concept\s*\(\s*')?(?P<concept_name>[^]']*)('\s*,\s*'(?P<concept_display_string>[^']*)'\s*\))?\s*(?P<formatting>\|[l])?\s*](?!])"
+    # r"\[\s*Concept\s*\(\s*'(?P<concept_name>[^]']*)('\s*,\s*'(?P<concept_display_string>[^']*)'\s*\))?\s*(?P<formatting>\|[l])?\s*]"
+)
+_WIKI_LINK_RE = re.compile(r'\[\[([^]|]+)(\|[^]]+)?]]')
+_OPTIONAL_LOCALIZATION_RE = re.compile(
+    r"\[\s*(SelectLocalization|AddLocalizationIf)\s*\(\s*GetPlayer\.IsValid\s*,\s*'(?P<loc_key>[^']*)'[^]]*]")
+_MULTIPLE_LINEBREAKS_RE = re.compile(r'(\\n){2,}')
+_FORMATTING_MARKER_RE = re.compile(r'#(\S+) ([^#]+)#!')
+_ICON_RE = re.compile(r'@([^!]*)!')
+_DEFINE_RE = re.compile(
+    r"\[\s*GetDefine\s*\(\s*'(?P<category>[^']*)'\s*,\s*'(?P<define>[^']*)'\s*\)\s*\|\s*(?P<formatting>[-vK0+=%]+)\s*]")
+_GET_NAME_RE = re.compile(r"\[\s*Get[a-zA-Z_]+\s*\(\s*'(?P<loc_key>[^']+)'\s*\).GetName\s*]")
+_LAW_GROUP_NAME_RE = re.compile(r"\[\s*GetLawType\s*\(\s*'(?P<law_key>[^']+)'\s*\).GetGroup.GetName\s*]")
+_INTEREST_GROUP_VARIANT_NAME_RE = re.compile(
+    r"\[\s*GetInterestGroupVariant\s*\(\s*'(?P<ig_key>[^']+)'\s*,\s*GetPlayer\s*\).GetNameWithCountryVariant\s*]")
+_NESTED_LOCALIZATION_RE = re.compile(r'\$([^$]*)\$')
+
 
 class Vic3WikiTextFormatter(WikiTextFormatter):
 
+    # the following dicts are class constants so that they don't have to be rebuilt for every replacement
+    formatting_marker_replacements = {'p': '{{{{green|{}}}}}',
+                                      'n': '{{{{red|{}}}}}',
+                                      'bold': "'''{}'''",
+                                      'b': "'''{}'''",
+                                      'italic': "''{}''",
+                                      'v': '{}'  # white
+                                      }
+
+    icon_replacements = {'aut': 'authority',
+                         'bur': 'bureaucracy',
+                         'construction': 'construction',
+                         'green_checkmark_box': 'yes',
+                         'inf': 'influence',
+                         'information': 'info',
+                         'innovation': 'innovation',
+                         'convoys': 'convoys',
+                         # pop types
+                         'academics': 'academics',
+                         'aristocrats': 'aristocrats',
+                         'bureaucrats': 'bureaucrats',
+                         'capitalists': 'capitalists',
+                         'clergymen': 'clergymen',
+                         'clerks': 'clerks',
+                         'engineers': 'engineers',
+                         'farmers': 'farmers',
+                         'laborers': 'laborers',
+                         'machinists': 'machinists',
+                         'officers': 'officers',
+                         'peasants': 'peasants',
+                         'shopkeepers': 'shopkeepers',
+                         'slaves': 'slaves',
+                         'soldiers': 'servicemen',
+                         # goods
+                         'aeroplanes': 'aeroplanes',
+                         'ammunition': 'ammunition',
+                         'artillery': 'artillery',
+                         'automobiles': 'automobiles',
+                         'clippers': 'clippers',
+                         'clothes': 'clothes',
+                         'coal': 'coal',
+                         'coffee': 'coffee',
+                         'dye': 'dye',
+                         'electricity': 'electricity',
+                         'engines': 'engines',
+                         'explosives': 'explosives',
+                         'fabric': 'fabric',
+                         'fertilizer': 'fertilizer',
+                         'fine_art': 'fine art',
+                         'fish': 'fish',
+                         'fruit': 'fruit',
+                         'furniture': 'furniture',
+                         'glass': 'glass',
+                         'gold': 'gold',
+                         'grain': 'grain',
+                         'groceries': 'groceries',
+                         'hardwood': 'hardwood',
+                         'ironclads': 'ironclads',
+                         'iron': 'iron',
+                         'lead': 'lead',
+                         'liquor': 'liquor',
+                         'luxury_clothes': 'luxury clothes',
+                         'luxury_furniture': 'luxury furniture',
+                         'manowars': 'man-o-wars',
+                         'meat': 'meat',
+                         'oil': 'oil',
+                         'opium': 'opium',
+                         'paper': 'paper',
+                         'porcelain': 'porcelain',
+                         'radios': 'radios',
+                         'rubber': 'rubber',
+                         'services': 'services',
+                         'silk': 'silk',
+                         'small_arms': 'small arms',
+                         'steamers': 'steamers',
+                         'steel': 'steel',
+                         'sugar': 'sugar',
+                         'sulfur': 'sulfur',
+                         'tanks': 'tanks',
+                         'tea': 'tea',
+                         'telephones': 'telephones',
+                         'tobacco': 'tobacco',
+                         'tools': 'tools',
+                         'transportation': 'transportation',
+                         'wine': 'wine',
+                         'wood': 'wood',
+                         }
+
+    compound_statement_key_mappings = {
+        'OR': 'At least one of',
+        'NOR': 'Neither of the following',
+    }
+
     def __init__(self):
         self.parser = vic3game.parser
+        # formatted texts which don't depend on the concepts of the current article
+        self._formatted_localization_cache: dict[str, str] = {}
 
     def format_localization_text(self, text, concepts_in_same_article: list[str]):
         """
@@ -18,6 +131,14 @@ class Vic3WikiTextFormatter(WikiTextFormatter):
         @param text: the text which should be formatted
         @param concepts_in_same_article: these strings will use a link starting with #
         """
+        if not concepts_in_same_article:
+            # most callers format the same display names over and over, so the result is cached for them
+            if text not in self._formatted_localization_cache:
+                self._formatted_localization_cache[text] = self._format_localization_text(text, [])
+            return self._formatted_localization_cache[text]
+        return self._format_localization_text(text, concepts_in_same_article)
+
+    def _format_localization_text(self, text, concepts_in_same_article: list[str]):
         previous_text = None
         # some concept localizations use other localizations themselves.
         # So we replace till nothing changes anymore (and hope that there is no loop)
@@ -26,120 +147,31 @@ class Vic3WikiTextFormatter(WikiTextFormatter):
             # the next line doesn't really fit here, but it has to be done early,
             # because it matches the [concept] formmating which comes afterwards
             text = text.replace('[Nbsp]', '&nbsp;')
-            text = re.sub(
-                r"(?<!\[)\[\s*(Concept\s*\(\s*')?(?P<concept_name>[^]']*)('\s*,\s*'(?P<concept_display_string>[^']*)'\s*\))?\s*(?P<formatting>\|[l])?\s*](?!])",
-                # r"\[\s*Concept\s*\(\s*'(?P<concept_name>[^]']*)('\s*,\s*'(?P<concept_display_string>[^']*)'\s*\))?\s*(?P<formatting>\|[l])?\s*]",
-                self.get_concept_link, text)
+            text = _CONCEPT_RE.sub(self.get_concept_link, text)
             text = self.resolve_nested_localizations(text)
             text = self.apply_localization_formatting(text)
-        text = re.sub(r'\[\[([^]|]+)(\|[^]]+)?]]',
-                      lambda match: '[[#{}]]'.format(match.group(1) + match.group(2))
-                      if match.group(1) in concepts_in_same_article
-                      else '[[{}]]'.format(match.group(1) + match.group(2)),
-                      text)
+        text = _WIKI_LINK_RE.sub(lambda match: '[[#{}]]'.format(match.group(1) + match.group(2))
+                                 if match.group(1) in concepts_in_same_article
+                                 else '[[{}]]'.format(match.group(1) + match.group(2)),
+                                 text)
         return text
 
     def _apply_formatting_markers(self, match: re.Match) -> str:
         format_key = match.group(1).lower()
         text = match.group(2)
-        replacements = {'p': '{{{{green|{}}}}}',
-                        'n': '{{{{red|{}}}}}',
-                        'bold': "'''{}'''",
-                        'b': "'''{}'''",
-                        'italic': "''{}''",
-                        'v': '{}'  # white
-                        }
-        if format_key not in replacements:
+        if format_key not in self.formatting_marker_replacements:
             Vic3FileGenerator.warn('ignoring unknown formatting marker {} in "{}"'.format(format_key, match.group(0)))
             return text
         else:
-            return replacements[format_key].format(text)
+            return self.formatting_marker_replacements[format_key].format(text)
 
     def _replace_icons(self, match: re.Match) -> str:
         icon_key = match.group(1).lower()
-        replacements = {'aut': 'authority',
-                        'bur': 'bureaucracy',
-                        'construction': 'construction',
-                        'green_checkmark_box': 'yes',
-                        'inf': 'influence',
-                        'information': 'info',
-                        'innovation': 'innovation',
-                        'convoys': 'convoys',
-                        # pop types
-                        'academics': 'academics',
-                        'aristocrats': 'aristocrats',
-                        'bureaucrats': 'bureaucrats',
-                        'capitalists': 'capitalists',
-                        'clergymen': 'clergymen',
-                        'clerks': 'clerks',
-                        'engineers': 'engineers',
-                        'farmers': 'farmers',
-                        'laborers': 'laborers',
-                        'machinists': 'machinists',
-                        'officers': 'officers',
-                        'peasants': 'peasants',
-                        'shopkeepers': 'shopkeepers',
-                        'slaves': 'slaves',
-                        'soldiers': 'servicemen',
-                        # goods
-                        'aeroplanes': 'aeroplanes',
-                        'ammunition': 'ammunition',
-                        'artillery': 'artillery',
-                        'automobiles': 'automobiles',
-                        'clippers': 'clippers',
-                        'clothes': 'clothes',
-                        'coal': 'coal',
-                        'coffee': 'coffee',
-                        'dye': 'dye',
-                        'electricity': 'electricity',
-                        'engines': 'engines',
-                        'explosives': 'explosives',
-                        'fabric': 'fabric',
-                        'fertilizer': 'fertilizer',
-                        'fine_art': 'fine art',
-                        'fish': 'fish',
-                        'fruit': 'fruit',
-                        'furniture': 'furniture',
-                        'glass': 'glass',
-                        'gold': 'gold',
-                        'grain': 'grain',
-                        'groceries': 'groceries',
-                        'hardwood': 'hardwood',
-                        'ironclads': 'ironclads',
-                        'iron': 'iron',
-                        'lead': 'lead',
-                        'liquor': 'liquor',
-                        'luxury_clothes': 'luxury clothes',
-                        'luxury_furniture': 'luxury furniture',
-                        'manowars': 'man-o-wars',
-                        'meat': 'meat',
-                        'oil': 'oil',
-                        'opium': 'opium',
-                        'paper': 'paper',
-                        'porcelain': 'porcelain',
-                        'radios': 'radios',
-                        'rubber': 'rubber',
-                        'services': 'services',
-                        'silk': 'silk',
-                        'small_arms': 'small arms',
-                        'steamers': 'steamers',
-                        'steel': 'steel',
-                        'sugar': 'sugar',
-                        'sulfur': 'sulfur',
-                        'tanks': 'tanks',
-                        'tea': 'tea',
-                        'telephones': 'telephones',
-                        'tobacco': 'tobacco',
-                        'tools': 'tools',
-                        'transportation': 'transportation',
-                        'wine': 'wine',
-                        'wood': 'wood',
-                        }
-        if icon_key not in replacements:
+        if icon_key not in self.icon_replacements:
             Vic3FileGenerator.warn('unknown icon {} in "{}"'.format(icon_key, match.group(0)))
             return match.group(0)
         else:
-            return '{{icon|' + replacements[icon_key] + '}}'
+            return '{{icon|' + self.icon_replacements[icon_key] + '}}'
 
     def _replace_defines(self, match: re.Match) -> str:
         value = self.parser.defines[match.group('category')][match.group('define')]
@@ -177,41 +209,46 @@ class Vic3WikiTextFormatter(WikiTextFormatter):
             return self.parser.localize(match.group('loc_key'))
 
     def apply_localization_formatting(self, text: str) -> str:
-        text = re.sub(r"\[\s*(SelectLocalization|AddLocalizationIf)\s*\(\s*GetPlayer\.IsValid\s*,\s*'(?P<loc_key>[^']*)'[^]]*]",
-                      self._add_optional_localization, text)
+        # most texts only use a few kinds of formatting. The cheap substring checks avoid running the regexes which
+        # can't match anyway
+        if '[' in text:
+            text = _OPTIONAL_LOCALIZATION_RE.sub(self._add_optional_localization, text)
 
         # various special cases
-        text = re.sub(r'(\\n){2,}', '\n\n', text)
-        text = re.sub(r'\\n', '<br />', text)
-        text = text.replace(r"\\'", "'")
+        if '\\' in text:
+            text = _MULTIPLE_LINEBREAKS_RE.sub('\n\n', text)
+            text = text.replace(r'\n', '<br />')
+            text = text.replace(r"\\'", "'")
 
         # to support nested formatting, we loop as long as something changes
         previous_text = None
         new_text = text
-        while previous_text != new_text:
+        while previous_text != new_text and '#' in new_text:
             previous_text = new_text
             # only matches the inner formatting. The others will be done in future loops
-            new_text = re.sub(r'#(\S+) ([^#]+)#!', self._apply_formatting_markers, previous_text)
-
-        text = re.sub(r'@([^!]*)!', self._replace_icons, new_text)
-        text = re.sub(r"\[\s*GetDefine\s*\(\s*'(?P<category>[^']*)'\s*,\s*'(?P<define>[^']*)'\s*\)\s*\|\s*(?P<formatting>[-vK0+=%]+)\s*]",
-                      self._replace_defines, text)
-        text = re.sub(r"\[\s*Get[a-zA-Z_]+\s*\(\s*'(?P<loc_key>[^']+)'\s*\).GetName\s*]",
-                      lambda match: self.parser.localize(match.group('loc_key')), text)
-        text = re.sub(r"\[\s*GetLawType\s*\(\s*'(?P<law_key>[^']+)'\s*\).GetGroup.GetName\s*]",
-                      lambda match: self.parser.laws[match.group('law_key')].group.display_name, text)
-        text = re.sub(r"\[\s*GetInterestGroupVariant\s*\(\s*'(?P<ig_key>[^']+)'\s*,\s*GetPlayer\s*\).GetNameWithCountryVariant\s*]",
-                      lambda match: self.parser.interest_groups[match.group('ig_key')].display_name, text)
+            new_text = _FORMATTING_MARKER_RE.sub(self._apply_formatting_markers, previous_text)
+
+        text = new_text
+        if '@' in text:
+            text = _ICON_RE.sub(self._replace_icons, text)
+        if '[' in text:
+            text = _DEFINE_RE.sub(self._replace_defines, text)
+            text = _GET_NAME_RE.sub(lambda match: self.parser.localize(match.group('loc_key')), text)
+            text = _LAW_GROUP_NAME_RE.sub(lambda match: self.parser.laws[match.group('law_key')].group.display_name, text)
+            text = _INTEREST_GROUP_VARIANT_NAME_RE.sub(
+                lambda match: self.parser.interest_groups[match.group('ig_key')].display_name, text)
         return text
 
     def resolve_nested_localizations(self, text: str):
         previous_text = None
         new_text = text
+        localize = self.parser.localize
         # some localizations use other localizations themselves.
-        # so we replace till nothing changes anymore (and hope that there is no loop)
-        while previous_text != new_text:
+        # so we replace till nothing changes anymore (and hope that there is no loop).
+        # Most texts don't contain a $ at all, so the cheap substring check avoids running the regex for them
+        while previous_text != new_text and '$' in new_text:
             previous_text = new_text
-            new_text = re.sub(r'\$([^$]*)\$', lambda match: self.parser.localize(match.group(1)), previous_text)
+            new_text = _NESTED_LOCALIZATION_RE.sub(lambda match: localize(match.group(1)), previous_text)
 
         return new_text
 
@@ -239,14 +276,7 @@ class Vic3WikiTextFormatter(WikiTextFormatter):
         return self.create_wiki_list(result, indent)
 
     def format_key_for_compound_statement(self, key):
-        key_mappings = {
-            'OR': 'At least one of',
-            'NOR': 'Neither of the following',
-        }
-        if key in key_mappings:
-            return key_mappings[key]
-        else:
-            return key
+        return self.compound_statement_key_mappings.get(key, key)
 
     @cached_property
     def entities_with_prefix(self):
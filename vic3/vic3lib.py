@@ -4,13 +4,26 @@ Most of them are subclasses of NameableEntity which provides a name and display
 which adds a description, icon, modifiers and required technologies(not all subclasses use all of these)"""
 import inspect
 import re
-from functools import cached_property
+from functools import cached_property, lru_cache
 from typing import Any
 
 from common.paradox_lib import NameableEntity, PdxColor
 from common.paradox_parser import Tree
 from vic3.game import vic3game
 
+# matches the position before each uppercase letter except the first one. Used to split class names into words
+_CAMEL_CASE_WORD_START_RE = re.compile(r'(?<!^)(?=[A-Z])')
+
+
+@lru_cache(maxsize=None)
+def _class_name_as_wiki_page_title(class_name: str) -> str:
+    """turns a class name like ProductionMethod into Production method. There are only a few classes, so the
+    results are cached"""
+    if class_name[1:].islower():
+        # single word names like Law or Decree don't need the regex
+        return class_name.capitalize()
+    return _CAMEL_CASE_WORD_START_RE.sub(' ', class_name).capitalize()
+
 
 class ModifierType(NameableEntity):
     percent: bool = False
@@ -25,7 +38,7 @@ class ModifierType(NameableEntity):
         prefix = ''
         postfix = ''
         formatted_value = value
-        if type(value) == int or type(value) == float:
+        if type(value) in (int, float):
             if value > 0:
                 prefix = '+'
             if value < 0:
@@ -72,15 +85,17 @@ class ModifierType(NameableEntity):
                 prefix = '{{red|' + prefix
                 postfix = postfix + '}}'
 
-        if self.postfix:
-            postfix += vic3game.parser.formatter.format_localization_text(vic3game.parser.localize(self.postfix), [])
-        if self.prefix:
-            prefix = vic3game.parser.formatter.format_localization_text(vic3game.parser.localize(self.prefix), []) + prefix
+        if self.postfix or self.prefix:
+            parser = vic3game.parser
+            if self.postfix:
+                postfix += parser.formatter.format_localization_text(parser.localize(self.postfix), [])
+            if self.prefix:
+                prefix = parser.formatter.format_localization_text(parser.localize(self.prefix), []) + prefix
 
         return f'{prefix}{formatted_value}{postfix}'
 
     def assert_number(self, value):
-        if type(value) != int and type(value) != float:
+        if type(value) not in (int, float):
             raise Exception('Unexpected value "{}" for modifier {}'.format(value, self.name))
 
 
@@ -112,7 +127,7 @@ class AdvancedEntity(NameableEntity):
         return f'[[{self.get_wiki_page_name()}#{self.display_name}|{self.display_name}]]'
 
     def get_class_name_as_wiki_page_title(self):
-        return re.sub(r'(?<!^)(?=[A-Z])', ' ', self.__class__.__name__).capitalize()
+        return _class_name_as_wiki_page_title(self.__class__.__name__)
 
     def get_wiki_icon(self) -> str:
         """assumes that it is in the icon template. Subclasses have to override this function if that's not the case"""
@@ -203,7 +218,7 @@ class StateTrait(AdvancedEntity):
 
     @cached_property
     def states(self) -> list[State]:
-        return [state for state in vic3game.parser.states.values() if self in state.traits]
+        return vic3game.parser.states_by_trait.get(self.name, [])
 
 
 class StrategicRegion(NameableEntity):
@@ -363,6 +378,13 @@ class Building(AdvancedEntity):
             bg = bg.parent_group
         return group_names
 
+    @cached_property
+    def topmost_building_group(self) -> BuildingGroup:
+        bg = self.building_group
+        while bg.parent_group is not None:
+            bg = bg.parent_group
+        return bg
+
 
 class ProductionMethodGroup(AdvancedEntity):
     production_methods: list[str] = None
@@ -380,14 +402,14 @@ class ProductionMethod(AdvancedEntity):
 
     @cached_property
     def groups(self) -> list[ProductionMethodGroup]:
-        return [group for group in vic3game.parser.production_method_groups.values()
-                if self.name in group.production_methods]
+        return vic3game.parser.production_method_groups_by_pm.get(self.name, [])
 
     @cached_property
     def buildings(self) -> list[Building]:
-        group_names = {group.name for group in self.groups}
+        # isdisjoint accepts any iterable, so the groups of the buildings don't have to be converted to sets
+        group_names = frozenset(group.name for group in self.groups)
         return [building for building in vic3game.parser.buildings.values()
-                if not group_names.isdisjoint(set(building.production_method_groups))]
+                if not group_names.isdisjoint(building.production_method_groups)]
 
     def get_wiki_icon(self) -> str:
         return self.get_wiki_file_tag()